@@ -1,41 +1,151 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
+from flask.json.provider import JSONProvider
+import concurrent.futures
 import json
+import threading
+import time
 import traceback
-from datetime import datetime
 from config import Config
 from coding_agent import CodingAgent
 from code_executor import CodeExecutor
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; Flask's default JSON provider is used without it
+    orjson = None
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson's C encoder/decoder."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object(Config)
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
-# Initialize components
-try:
-    coding_agent = CodingAgent()
-    code_executor = CodeExecutor()
-except Exception as e:
-    print(f"Warning: Failed to initialize coding agent: {e}")
-    print("Please make sure your OpenAI API key is set in the environment variables.")
-    coding_agent = None
-    code_executor = CodeExecutor()
+# Components are constructed lazily so WSGI workers build them after fork
+# (once per worker) instead of in the master at import time
+coding_agent = None
+code_executor = None
+_init_lock = threading.Lock()
+
+def init_components():
+    """Initialize the coding agent and executor once per process."""
+    global coding_agent, code_executor
+    if code_executor is not None:
+        return
+    with _init_lock:
+        if code_executor is not None:
+            return
+        try:
+            coding_agent = CodingAgent()
+        except Exception as e:
+            print(f"Warning: Failed to initialize coding agent: {e}")
+            print("Please make sure your OpenAI API key is set in the environment variables.")
+            coding_agent = None
+        code_executor = CodeExecutor()
+
+@app.before_request
+def _ensure_components():
+    """Make sure components exist before handling any request."""
+    init_components()
+
+def _iso_now(_cache=[0, '']):
+    """Return an ISO-8601 UTC timestamp, reformatted at most once per second.
+
+    Response timestamps don't need sub-second precision, so hot paths skip
+    the per-request datetime construction and ISO formatting.
+    """
+    t = int(time.time())
+    if t != _cache[0]:
+        _cache[0] = t
+        _cache[1] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(t))
+    return _cache[1]
+
+def _debug_traceback():
+    """Format the active exception's traceback, but only in debug mode.
+
+    format_exc walks and symbolizes the whole stack, so the production
+    error path must never pay for it.
+    """
+    return traceback.format_exc() if app.debug else None
+
+# Small thread pool that lets speculative executions overlap with the
+# tail of a streamed generation
+_speculative_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+def _generate_and_execute_speculatively(task_description):
+    """
+    Generate code via the streaming API and start executing it as soon as
+    the code fence closes, overlapping execution with the trailing
+    explanation tokens. Falls back to a serial run if the final parsed code
+    differs from what was executed speculatively.
+
+    Returns (generation_result, execution_result); execution_result is None
+    when generation failed.
+    """
+    speculative_code = None
+    execution_future = None
+    generation_result = None
+
+    for event, payload in coding_agent.generate_code_stream(task_description):
+        if event == 'code' and execution_future is None:
+            speculative_code = payload
+            execution_future = _speculative_executor.submit(
+                code_executor.execute_code, payload
+            )
+        elif event == 'result':
+            generation_result = payload
+
+    if not generation_result['success']:
+        if execution_future is not None:
+            execution_future.cancel()
+        return generation_result, None
+
+    if execution_future is not None and generation_result['code'] == speculative_code:
+        return generation_result, execution_future.result()
+
+    # The stream revealed more code after the first block (or none ran
+    # speculatively); execute the full parsed code serially
+    if execution_future is not None:
+        execution_future.cancel()
+    return generation_result, code_executor.execute_code(generation_result['code'])
 
 @app.route('/')
 def index():
     """Main page route."""
     return render_template('index.html')
 
+def _generation_events(task_description):
+    """Yield SSE events for a streamed code generation."""
+    for event, payload in coding_agent.generate_code_stream(task_description):
+        if event == 'delta':
+            body = {'type': 'delta', 'content': payload}
+        elif event == 'code':
+            body = {'type': 'code', 'code': payload}
+        else:
+            payload['timestamp'] = _iso_now()
+            body = {'type': 'result', 'result': payload}
+        yield f"data: {json.dumps(body)}\n\n"
+
 @app.route('/api/generate', methods=['POST'])
 def generate_code():
     """API endpoint to generate code from natural language description."""
     try:
         # Get task description from request
         data = request.get_json()
-        print(data)
         task_description = data.get('task_description', '').strip()
-        print(task_description)
-        print(coding_agent)
-        
+
+        if app.debug:
+            app.logger.debug("generate payload=%s task=%s", data, task_description)
+
         if not task_description:
             return jsonify({
                 'success': False,
@@ -57,19 +167,27 @@ def generate_code():
                 'suggestions': validation.get('suggestions', [])
             }), 400
         
+        # Stream the generation over SSE when the client asks for it, so the
+        # UI sees tokens as they arrive instead of waiting for the last one
+        if data.get('stream'):
+            return Response(
+                stream_with_context(_generation_events(task_description)),
+                mimetype='text/event-stream'
+            )
+
         # Generate code
         result = coding_agent.generate_code(task_description)
-        
+
         # Add timestamp
-        result['timestamp'] = datetime.now().isoformat()
-        
+        result['timestamp'] = _iso_now()
+
         return jsonify(result)
         
     except Exception as e:
         return jsonify({
             'success': False,
             'error': f'Internal server error: {str(e)}',
-            'traceback': traceback.format_exc() if app.debug else None
+            'traceback': _debug_traceback()
         }), 500
 
 @app.route('/api/execute', methods=['POST'])
@@ -90,7 +208,7 @@ def execute_code():
         result = code_executor.execute_code(code)
         
         # Add timestamp
-        result['timestamp'] = datetime.now().isoformat()
+        result['timestamp'] = _iso_now()
         
         return jsonify(result)
         
@@ -98,7 +216,48 @@ def execute_code():
         return jsonify({
             'success': False,
             'error': f'Internal server error: {str(e)}',
-            'traceback': traceback.format_exc() if app.debug else None
+            'traceback': _debug_traceback()
+        }), 500
+
+@app.route('/api/generate-batch', methods=['POST'])
+def generate_code_batch():
+    """API endpoint to generate code for several tasks in one OpenAI call."""
+    try:
+        data = request.get_json()
+        tasks = data.get('task_descriptions', [])
+
+        if not isinstance(tasks, list) or not tasks:
+            return jsonify({
+                'success': False,
+                'error': 'Please provide a non-empty list of task descriptions'
+            }), 400
+
+        tasks = [str(task).strip() for task in tasks]
+        if any(not task for task in tasks):
+            return jsonify({
+                'success': False,
+                'error': 'Task descriptions must not be empty'
+            }), 400
+
+        if not coding_agent:
+            return jsonify({
+                'success': False,
+                'error': 'Coding agent not available. Please check your OpenAI API key configuration.'
+            }), 500
+
+        results = coding_agent.generate_code_batch(tasks)
+
+        return jsonify({
+            'success': all(result['success'] for result in results),
+            'results': results,
+            'timestamp': _iso_now()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Internal server error: {str(e)}',
+            'traceback': _debug_traceback()
         }), 500
 
 @app.route('/api/generate-and-execute', methods=['POST'])
@@ -130,9 +289,11 @@ def generate_and_execute():
                 'suggestions': validation.get('suggestions', [])
             }), 400
         
-        # Generate code
-        generation_result = coding_agent.generate_code(task_description)
-        
+        # Stream the generation and execute ahead of it
+        generation_result, execution_result = _generate_and_execute_speculatively(
+            task_description
+        )
+
         if not generation_result['success']:
             return jsonify({
                 'success': False,
@@ -140,16 +301,13 @@ def generate_and_execute():
                 'generation_result': generation_result
             }), 500
         
-        # Execute the generated code
-        execution_result = code_executor.execute_code(generation_result['code'])
-        
         # Combine results
         combined_result = {
             'success': True,
             'task_description': task_description,
             'generation': generation_result,
             'execution': execution_result,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _iso_now()
         }
         
         return jsonify(combined_result)
@@ -158,7 +316,7 @@ def generate_and_execute():
         return jsonify({
             'success': False,
             'error': f'Internal server error: {str(e)}',
-            'traceback': traceback.format_exc() if app.debug else None
+            'traceback': _debug_traceback()
         }), 500
 
 @app.route('/api/validate', methods=['POST'])
@@ -185,18 +343,30 @@ def validate_task():
             'suggestions': []
         }), 500
 
+# Serialized /api/stats body cached briefly so frontend polling doesn't
+# rebuild and re-encode the same payload on every request
+_stats_cache = {'ts': 0.0, 'body': None}
+
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     """API endpoint to get system statistics."""
     try:
+        now = time.monotonic()
+        if _stats_cache['body'] is not None and now - _stats_cache['ts'] < 1.0:
+            return Response(_stats_cache['body'], mimetype='application/json')
+
         stats = {
             'executor_stats': code_executor.get_execution_stats(),
             'agent_available': coding_agent is not None,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': _iso_now()
         }
-        
-        return jsonify(stats)
-        
+
+        body = app.json.dumps(stats)
+        _stats_cache['ts'] = now
+        _stats_cache['body'] = body
+
+        return Response(body, mimetype='application/json')
+
     except Exception as e:
         return jsonify({
             'error': f'Failed to get stats: {str(e)}'
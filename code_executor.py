@@ -1,13 +1,239 @@
+import ast
+import atexit
+import concurrent.futures
+import multiprocessing
 import subprocess
 import sys
 import io
 import contextlib
+import os
 import signal
 import threading
 import time
-from typing import Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Tuple
 from config import Config
 
+# Built-in callables that must never be reachable from user code
+_BANNED_CALLS = frozenset({
+    'eval', 'exec', 'compile', 'open', 'input', '__import__',
+    'getattr', 'setattr', 'globals', 'locals', 'vars'
+})
+
+# Shared worker pool for sandboxed execution. A single persistent pool
+# avoids paying process-spawn overhead on every call, and lets timeouts
+# actually kill runaway code (a daemon thread cannot be stopped).
+_EXECUTOR_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+def _new_executor_pool() -> ProcessPoolExecutor:
+    """Create the sandbox worker pool."""
+    return ProcessPoolExecutor(
+        max_workers=max(2, (os.cpu_count() or 2) // 2),
+        mp_context=multiprocessing.get_context("forkserver")
+    )
+
+def _get_executor_pool() -> ProcessPoolExecutor:
+    """Return the shared worker pool, creating it on first use."""
+    global _EXECUTOR_POOL
+    with _POOL_LOCK:
+        if _EXECUTOR_POOL is None:
+            _EXECUTOR_POOL = _new_executor_pool()
+        return _EXECUTOR_POOL
+
+def _replace_executor_pool():
+    """Swap in a fresh pool immediately (used when the pool is broken)."""
+    global _EXECUTOR_POOL
+    with _POOL_LOCK:
+        pool = _EXECUTOR_POOL
+        _EXECUTOR_POOL = _new_executor_pool()
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _retire_executor_pool():
+    """Replace the pool, then reap the old one after in-flight work drains.
+
+    Called on an execution timeout. Other threads may still have healthy
+    executions running on the old pool, so instead of SIGKILLing every
+    worker at once, new submissions move to a fresh pool while the old
+    workers get a grace period of one full execution timeout — by then any
+    legitimate task has finished or timed out on its own — before the
+    stragglers (the runaway included) are killed.
+    """
+    global _EXECUTOR_POOL
+    with _POOL_LOCK:
+        pool = _EXECUTOR_POOL
+        _EXECUTOR_POOL = _new_executor_pool()
+    if pool is None:
+        return
+
+    def _reap():
+        time.sleep(Config.MAX_EXECUTION_TIME + 1)
+        for process in list(getattr(pool, '_processes', {}).values()):
+            try:
+                os.kill(process.pid, signal.SIGKILL)
+            except (OSError, ProcessLookupError):
+                pass
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    threading.Thread(target=_reap, daemon=True,
+                     name="executor-pool-reaper").start()
+
+@atexit.register
+def _shutdown_executor_pool():
+    """Shut down the worker pool on interpreter exit."""
+    if _EXECUTOR_POOL is not None:
+        _EXECUTOR_POOL.shutdown(wait=False, cancel_futures=True)
+
+class OutputLimitExceeded(Exception):
+    """Raised inside the worker when user code exceeds the output limit."""
+
+class _BoundedWriter(io.TextIOBase):
+    """
+    stdout/stderr replacement that stops user code at the output limit.
+
+    Buffers written text as utf-8 bytes and raises OutputLimitExceeded once
+    the byte budget is spent, so a print loop dies immediately instead of
+    filling memory until the timeout.
+    """
+
+    def __init__(self, limit: int):
+        self._chunks = []
+        self._size = 0
+        self._limit = limit
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        data = s.encode('utf-8', errors='replace')
+        remaining = self._limit - self._size
+        if len(data) > remaining:
+            self._chunks.append(data[:remaining])
+            self._size = self._limit
+            raise OutputLimitExceeded()
+        self._chunks.append(data)
+        self._size += len(data)
+        return len(s)
+
+    def getvalue(self) -> str:
+        return b''.join(self._chunks).decode('utf-8', errors='replace')
+
+# Safe-globals template cached per worker process
+_worker_globals_template: Optional[dict] = None
+
+def _run_user_code(tree: ast.Module) -> Tuple[str, str]:
+    """
+    Execute a validated AST inside a pool worker.
+
+    Runs in the worker process: builds (and caches) the restricted globals,
+    executes the code with stdout/stderr redirected, and returns the
+    captured output. Exceptions propagate back through the future.
+    """
+    global _worker_globals_template
+    if _worker_globals_template is None:
+        _worker_globals_template = _build_safe_globals(Config.ALLOWED_IMPORTS)
+
+    # Bounded capture: user code is stopped the moment it exceeds the
+    # output budget rather than accumulating output until the timeout
+    stdout_capture = _BoundedWriter(Config.MAX_OUTPUT_LENGTH)
+    stderr_capture = _BoundedWriter(Config.MAX_OUTPUT_LENGTH)
+
+    exec_globals = _worker_globals_template.copy()
+    truncated = False
+    try:
+        with contextlib.redirect_stdout(stdout_capture), \
+             contextlib.redirect_stderr(stderr_capture):
+            exec(compile(tree, '<string>', 'exec'), exec_globals, {})
+    except OutputLimitExceeded:
+        truncated = True
+
+    stdout_content = stdout_capture.getvalue()
+    if truncated:
+        stdout_content += "\n... (output truncated)"
+
+    return stdout_content, stderr_capture.getvalue()
+
+def _restricted_import(allowed_roots):
+    """Build an __import__ that only resolves allow-listed modules.
+
+    Validation already rejects disallowed import statements, but user code
+    still needs a working __import__ for the allowed ones; without it every
+    import statement fails at runtime.
+    """
+    def _import(name, globals=None, locals=None, fromlist=(), level=0):
+        if level != 0 or name.split('.')[0] not in allowed_roots:
+            raise ImportError(f"Import of '{name}' is not allowed for security reasons")
+        return __import__(name, globals, locals, fromlist, level)
+    return _import
+
+def _build_safe_globals(allowed_imports) -> dict:
+    """
+    Create a safe globals dictionary with limited built-ins.
+
+    Returns:
+        Dict with safe global variables and functions
+    """
+    allowed_roots = {name.split('.')[0] for name in allowed_imports}
+
+    # Start with a minimal set of safe built-ins
+    safe_builtins = {
+        '__builtins__': {
+            '__import__': _restricted_import(allowed_roots),
+            'print': print,
+            'len': len,
+            'str': str,
+            'int': int,
+            'float': float,
+            'bool': bool,
+            'list': list,
+            'dict': dict,
+            'tuple': tuple,
+            'set': set,
+            'range': range,
+            'enumerate': enumerate,
+            'zip': zip,
+            'map': map,
+            'filter': filter,
+            'sorted': sorted,
+            'sum': sum,
+            'min': min,
+            'max': max,
+            'abs': abs,
+            'round': round,
+            'pow': pow,
+            'divmod': divmod,
+            'isinstance': isinstance,
+            'type': type,
+            'ValueError': ValueError,
+            'TypeError': TypeError,
+            'IndexError': IndexError,
+            'KeyError': KeyError,
+            'Exception': Exception,
+        }
+    }
+
+    # Add allowed modules
+    allowed_modules = {}
+    for module_name in allowed_imports:
+        try:
+            if '.' in module_name:
+                # Handle imports like 'matplotlib.pyplot'
+                parts = module_name.split('.')
+                module = __import__(module_name, fromlist=[parts[-1]])
+                allowed_modules[parts[-1]] = module
+            else:
+                module = __import__(module_name)
+                allowed_modules[module_name] = module
+        except ImportError:
+            # Module not available, skip it
+            pass
+
+    # Combine safe builtins with allowed modules
+    safe_globals = {**safe_builtins, **allowed_modules}
+    return safe_globals
+
 class CodeExecutor:
     """Safe Python code executor with timeout and output capture."""
     
@@ -16,6 +242,7 @@ class CodeExecutor:
         self.max_execution_time = Config.MAX_EXECUTION_TIME
         self.max_output_length = Config.MAX_OUTPUT_LENGTH
         self.allowed_imports = Config.ALLOWED_IMPORTS
+        self._allowed_roots = {name.split('.')[0] for name in self.allowed_imports}
     
     def execute_code(self, code: str) -> Dict[str, Any]:
         """
@@ -38,10 +265,6 @@ class CodeExecutor:
                 "code": code
             }
         
-        # Prepare execution environment
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
-        
         start_time = time.time()
         result = {
             "success": False,
@@ -50,59 +273,40 @@ class CodeExecutor:
             "execution_time": 0,
             "code": code
         }
-        
+
         try:
-            # Create a restricted execution environment
-            exec_globals = self._create_safe_globals()
-            exec_locals = {}
-            
-            # Execute code with timeout
-            with contextlib.redirect_stdout(stdout_capture), \
-                 contextlib.redirect_stderr(stderr_capture):
-                
-                # Use threading for timeout control
-                execution_thread = threading.Thread(
-                    target=self._execute_with_globals,
-                    args=(code, exec_globals, exec_locals)
-                )
-                
-                execution_thread.daemon = True
-                execution_thread.start()
-                execution_thread.join(timeout=self.max_execution_time)
-                
-                if execution_thread.is_alive():
-                    # Timeout occurred
-                    result["error"] = f"Code execution timed out after {self.max_execution_time} seconds"
-                    return result
-            
-            # Capture output
-            stdout_content = stdout_capture.getvalue()
-            stderr_content = stderr_capture.getvalue()
-            
-            # Limit output length
-            if len(stdout_content) > self.max_output_length:
-                stdout_content = stdout_content[:self.max_output_length] + "\n... (output truncated)"
-            
+            # Run in the shared worker pool so timeouts can kill the process
+            future = _get_executor_pool().submit(
+                _run_user_code, validation_result["_ast"]
+            )
+            stdout_content, stderr_content = future.result(
+                timeout=self.max_execution_time
+            )
+
             result["success"] = True
             result["output"] = stdout_content
             result["error"] = stderr_content if stderr_content else ""
-            
+
+        except concurrent.futures.TimeoutError:
+            # Route new work to a fresh pool; the runaway worker is reaped
+            # once concurrent executions have had time to finish
+            _retire_executor_pool()
+            result["error"] = f"Code execution timed out after {self.max_execution_time} seconds"
+        except BrokenProcessPool:
+            _replace_executor_pool()
+            result["error"] = "Code execution worker crashed; please try again"
         except SyntaxError as e:
             result["error"] = f"Syntax Error: {str(e)}"
         except ImportError as e:
             result["error"] = f"Import Error: {str(e)} - This import is not allowed for security reasons"
         except Exception as e:
             result["error"] = f"Runtime Error: {str(e)}"
-        
+
         finally:
             result["execution_time"] = time.time() - start_time
-        
+
         return result
     
-    def _execute_with_globals(self, code: str, exec_globals: dict, exec_locals: dict):
-        """Execute code with the provided globals and locals."""
-        exec(code, exec_globals, exec_locals)
-    
     def _validate_code(self, code: str) -> Dict[str, Any]:
         """
         Validate code for basic security and syntax issues.
@@ -116,100 +320,47 @@ class CodeExecutor:
         if not code or not code.strip():
             return {"valid": False, "error": "No code provided"}
         
-        # Check for dangerous operations
-        dangerous_patterns = [
-            'import os', 'import subprocess', 'import sys',
-            'eval(', 'exec(', '__import__',
-            'open(', 'file(', 'input(',
-            'raw_input(', 'compile(',
-            'globals()', 'locals()', 'vars(',
-            'dir(', 'getattr(', 'setattr(',
-            'delattr(', 'hasattr(',
-            'exit(', 'quit(', 'reload('
-        ]
-        
-        code_lower = code.lower()
-        for pattern in dangerous_patterns:
-            if pattern in code_lower:
-                return {
-                    "valid": False,
-                    "error": f"Potentially dangerous operation detected: {pattern}"
-                }
-        
-        # Check syntax
+        # Parse once; this doubles as the syntax check
         try:
-            compile(code, '<string>', 'exec')
+            tree = ast.parse(code)
         except SyntaxError as e:
             return {
                 "valid": False,
                 "error": f"Syntax error: {str(e)}"
             }
-        
-        return {"valid": True, "error": ""}
+
+        # Walk the AST for imports outside the allow-list and banned calls;
+        # this avoids the false positives/negatives of substring matching
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name.split('.')[0] not in self._allowed_roots:
+                        return {
+                            "valid": False,
+                            "error": f"Potentially dangerous operation detected: import {alias.name}"
+                        }
+            elif isinstance(node, ast.ImportFrom):
+                module = node.module or ''
+                if module.split('.')[0] not in self._allowed_roots:
+                    return {
+                        "valid": False,
+                        "error": f"Potentially dangerous operation detected: from {module or '.'} import ..."
+                    }
+            elif isinstance(node, ast.Call):
+                func = node.func
+                if isinstance(func, ast.Name) and func.id in _BANNED_CALLS:
+                    return {
+                        "valid": False,
+                        "error": f"Potentially dangerous operation detected: {func.id}("
+                    }
+
+        # Hand the parsed tree back so execution can compile it directly
+        return {"valid": True, "error": "", "_ast": tree}
     
     def _create_safe_globals(self) -> dict:
-        """
-        Create a safe globals dictionary with limited built-ins.
-        
-        Returns:
-            Dict with safe global variables and functions
-        """
-        # Start with a minimal set of safe built-ins
-        safe_builtins = {
-            '__builtins__': {
-                'print': print,
-                'len': len,
-                'str': str,
-                'int': int,
-                'float': float,
-                'bool': bool,
-                'list': list,
-                'dict': dict,
-                'tuple': tuple,
-                'set': set,
-                'range': range,
-                'enumerate': enumerate,
-                'zip': zip,
-                'map': map,
-                'filter': filter,
-                'sorted': sorted,
-                'sum': sum,
-                'min': min,
-                'max': max,
-                'abs': abs,
-                'round': round,
-                'pow': pow,
-                'divmod': divmod,
-                'isinstance': isinstance,
-                'type': type,
-                'ValueError': ValueError,
-                'TypeError': TypeError,
-                'IndexError': IndexError,
-                'KeyError': KeyError,
-                'Exception': Exception,
-            }
-        }
-        
-        # Add allowed modules
-        allowed_modules = {}
-        for module_name in self.allowed_imports:
-            try:
-                if '.' in module_name:
-                    # Handle imports like 'matplotlib.pyplot'
-                    parts = module_name.split('.')
-                    module = __import__(module_name, fromlist=[parts[-1]])
-                    allowed_modules[parts[-1]] = module
-                else:
-                    module = __import__(module_name)
-                    allowed_modules[module_name] = module
-            except ImportError:
-                # Module not available, skip it
-                pass
-        
-        # Combine safe builtins with allowed modules
-        safe_globals = {**safe_builtins, **allowed_modules}
-        return safe_globals
-    
+        """Create a safe globals dictionary with limited built-ins."""
+        return _build_safe_globals(self.allowed_imports)
+
     def get_execution_stats(self) -> Dict[str, Any]:
         """
         Get current execution environment statistics.
@@ -1,22 +1,261 @@
 from openai import OpenAI
+import httpx
+import atexit
+import copy
+import hashlib
 import re
 import os
-from typing import Dict, Tuple
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
 from config import Config
 from dotenv import load_dotenv
 
+# Static extension of the system prompt. OpenAI's server-side prompt cache
+# only kicks in for prompts of ~1024+ tokens, so this block pads the shared
+# system prefix past that threshold. It must stay byte-identical across
+# calls (no timestamps, user names, or other interpolation) or every
+# request becomes a cache miss.
+_SYSTEM_PROMPT_EXTENSION = """
+Detailed coding standards to follow in every response:
+
+Naming and structure:
+- Use snake_case for variables and functions, PascalCase for classes, and UPPER_CASE for constants.
+- Prefer small, single-purpose functions over long scripts; extract helpers when a block of logic has a clear name.
+- Give functions docstrings when their purpose is not obvious from the name; one concise sentence is enough.
+- Keep the main entry logic at the bottom of the script, after all function and class definitions.
+- Avoid single-letter names except for trivial loop indices and well-known conventions such as x and y in coordinates.
+
+Correctness and edge cases:
+- Validate inputs at function boundaries and fail with a clear ValueError or TypeError message rather than producing wrong results.
+- Consider empty sequences, zero, negative numbers, and None wherever they could plausibly reach the code.
+- When dividing, guard against division by zero with an explicit check or a documented exception.
+- When parsing user-provided strings into numbers or dates, handle the failure case explicitly.
+- Prefer returning values over printing them from helper functions; print only in the top-level demonstration code.
+
+Idiomatic Python:
+- Use list comprehensions and generator expressions where they improve clarity, not merely to shorten code.
+- Use enumerate instead of manual index counters and zip for parallel iteration.
+- Use f-strings for formatting; avoid string concatenation in loops.
+- Use the with statement for any resource that supports it.
+- Prefer the standard library over hand-rolled implementations: collections, itertools, functools, math, and datetime cover most needs.
+- Use tuple unpacking for multiple return values instead of small classes or dicts when the shape is fixed.
+
+Performance and clarity:
+- Choose the right data structure first: sets and dicts for membership tests, lists for ordered data, deques for queues.
+- Avoid quadratic patterns such as repeated membership tests against a list inside a loop.
+- Do not micro-optimize at the cost of readability; note the trade-off in a comment when it matters.
+- Keep comments focused on why the code does something; the code itself should show what it does.
+
+Error handling:
+- Catch the narrowest exception type that covers the failure; never use a bare except clause.
+- Re-raise or surface errors with enough context to diagnose them; do not swallow exceptions silently.
+- Use try/finally or context managers to guarantee cleanup, never manual flag tracking.
+- Distinguish between programmer errors (assertions, TypeError) and expected runtime failures (ValueError, IOError) and handle them differently.
+- When a function can partially succeed, document and implement a clear all-or-nothing or best-effort policy.
+
+Data handling:
+- When working with tabular data, prefer pandas if available; otherwise use csv and dictionaries keyed by column name.
+- When working with numeric arrays, prefer numpy vectorized operations over explicit Python loops.
+- Treat all external text as untrusted: strip whitespace, normalize case where appropriate, and validate before use.
+- Use datetime objects for date arithmetic rather than manipulating formatted strings.
+- Round or format floating-point values only at the display boundary, never during intermediate computation.
+
+Testing and examples:
+- Make demonstration output deterministic where possible; seed random generators when randomness is involved.
+- Choose sample data that exercises at least one edge case alongside the typical case.
+- Show expected output in a comment when it makes the demonstration clearer.
+- Keep demonstrations fast: no sleeps, no network access, no unbounded loops.
+
+Output discipline:
+- Emit exactly one fenced python code block per task, followed by its explanation.
+- The code block must be self-contained and runnable as given, including all imports at the top.
+- Include a short demonstration at the end of the script that exercises the main functionality with sample data.
+- Keep explanations brief and concrete: state what the code does, the approach taken, and any assumptions made.
+- Never include placeholder sections, TODO markers, or references to code that is not present in the block.
+"""
+# Words that flag a task description as too vague to generate from
+_VAGUE_KEYWORDS = frozenset({'something', 'anything', 'stuff', 'thing'})
+_WORD_RE = re.compile(r'[a-z]+')
+
+# Precompiled response-parsing patterns, shared by every generation
+_CODE_PY_RE = re.compile(r'```python\n(.*?)```', re.DOTALL)
+_CODE_ANY_RE = re.compile(r'```\n(.*?)```', re.DOTALL)
+_EXPL_PREFIX_RE = re.compile(r'^Explanation:\s*', re.IGNORECASE)
+
+_BATCH_ITEM_RE = re.compile(
+    r"<<<ITEM (\d+)>>>.*?```python\n(.*?)```\s*Explanation:\s*(.*?)(?=<<<ITEM|\Z)",
+    re.DOTALL
+)
+
+class _PromptCache:
+    """LRU cache mapping embedded task descriptions to generation results.
+
+    Entries are keyed on the normalized prompt text and hold a unit-normalized
+    embedding alongside the cached result, so lookups can match paraphrased
+    prompts via cosine similarity instead of exact text equality.
+    """
+
+    # Minimum seconds between pickle writes; store() only marks entries
+    # dirty and flush() persists them off the per-generation hot path
+    _SAVE_INTERVAL = 5.0
+
+    def __init__(self, max_entries: int = Config.SEMANTIC_CACHE_SIZE,
+                 threshold: float = Config.SEMANTIC_CACHE_THRESHOLD,
+                 cache_path: str = Config.SEMANTIC_CACHE_PATH):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.cache_path = cache_path
+        # normalized prompt -> (embedding float32 ndarray, result dict)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+        atexit.register(self.flush)
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        """Collapse whitespace and case so trivial rephrasings share a key."""
+        return ' '.join(text.lower().split())
+
+    @staticmethod
+    def _normalize_vector(embedding) -> np.ndarray:
+        """Convert an embedding to a unit-length float32 vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, task_description: str, embedding) -> Optional[Dict]:
+        """Return the cached result for the most similar prompt, if any."""
+        key = self._normalize_text(task_description)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return dict(self._entries[key][1])
+
+            if not self._entries:
+                return None
+
+            # Vectorized cosine similarity: all stored vectors are
+            # pre-normalized, so a single matrix-vector product gives every
+            # similarity at once.
+            query = self._normalize_vector(embedding)
+            matrix = np.vstack([entry[0] for entry in self._entries.values()])
+            similarities = matrix.dot(query)
+            best_index = int(np.argmax(similarities))
+            if similarities[best_index] >= self.threshold:
+                best_key = list(self._entries.keys())[best_index]
+                self._entries.move_to_end(best_key)
+                return dict(self._entries[best_key][1])
+        return None
+
+    def store(self, task_description: str, embedding, result: Dict):
+        """Cache a generation result, evicting the oldest entry when full."""
+        key = self._normalize_text(task_description)
+        with self._lock:
+            self._entries[key] = (self._normalize_vector(embedding), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+            save_due = time.monotonic() - self._last_save >= self._SAVE_INTERVAL
+        if save_due:
+            self.flush()
+
+    def flush(self):
+        """Persist unsaved entries to disk so restarts keep the cache warm."""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = OrderedDict(self._entries)
+            self._dirty = False
+            self._last_save = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, 'wb') as f:
+                pickle.dump(snapshot, f)
+        except OSError:
+            # Persistence is best-effort; the in-memory cache still works.
+            pass
+
+    def _load(self):
+        """Load persisted cache entries from disk, ignoring corrupt files."""
+        try:
+            with open(self.cache_path, 'rb') as f:
+                self._entries = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            self._entries = OrderedDict()
+
+def _pool_limits() -> 'httpx.Limits':
+    """Connection-pool limits for the shared HTTP client."""
+    return httpx.Limits(max_connections=512, max_keepalive_connections=128)
+
+def _pool_timeout() -> 'httpx.Timeout':
+    """Request timeout for the shared HTTP client."""
+    return httpx.Timeout(60.0, connect=5.0)
+
+def _http2_available() -> bool:
+    """True when the optional h2 package (httpx[http2]) is installed."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
 class CodingAgent:
     """AI-powered coding agent that generates Python code from natural language descriptions."""
     load_dotenv()
 
+    # The HTTP client is a class attribute so every agent instance and every
+    # thread draws from one shared connection pool instead of serializing
+    # on httpx's defaults (100 connections / 20 keepalive) per instance.
+    _http_client = None
+    _client_lock = threading.Lock()
+
     def __init__(self):
         """Initialize the coding agent with OpenAI API."""
         self.api_key = os.getenv("OPENAI_API_KEY")
-        # if not self.api_key:
-        #     raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
+        if not self.api_key:
+            raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
 
-        OpenAI.api_key = os.getenv("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        with CodingAgent._client_lock:
+            if CodingAgent._http_client is None:
+                CodingAgent._http_client = httpx.Client(
+                    http2=_http2_available(),
+                    limits=_pool_limits(),
+                    timeout=_pool_timeout()
+                )
+
+        self.client = OpenAI(api_key=self.api_key,
+                             http_client=CodingAgent._http_client)
+        self._prompt_cache = _PromptCache() if Config.ENABLE_SEMANTIC_CACHE else None
+
+        # Exact-match cache for literally identical prompts (demos, retries);
+        # checked before the semantic cache since it needs no embedding call.
+        self._exact_cache: OrderedDict = OrderedDict()
+        self._exact_cache_size = Config.SEMANTIC_CACHE_SIZE
+        self._cache_lock = threading.Lock()
+
+    def _exact_cache_key(self, task_description: str) -> str:
+        """Hash the system prompt and task together into a cache key."""
+        payload = self._get_system_prompt() + "\0" + task_description
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _embed_task(self, task_description: str) -> Optional[np.ndarray]:
+        """Embed a task description for semantic cache lookups."""
+        try:
+            response = self.client.embeddings.create(
+                model="text-embedding-3-small",
+                input=task_description
+            )
+            return np.asarray(response.data[0].embedding, dtype=np.float32)
+        except Exception:
+            # Embedding failures just skip the cache; generation still works.
+            return None
 
     def generate_code(self, task_description: str) -> Dict[str, any]:
         """
@@ -29,12 +268,28 @@ class CodingAgent:
             Dict containing generated code, explanation, and metadata
         """
         try:
+            # Short-circuit on exact-duplicate prompts with an O(1) lookup
+            cache_key = self._exact_cache_key(task_description)
+            cached = self._lookup_exact(cache_key, task_description)
+            if cached is not None:
+                return cached
+
+            # Serve semantically similar prompts from the cache when enabled
+            embedding = None
+            if self._prompt_cache is not None:
+                embedding = self._embed_task(task_description)
+                if embedding is not None:
+                    cached = self._prompt_cache.lookup(task_description, embedding)
+                    if cached is not None:
+                        cached["task"] = task_description
+                        return cached
+
             # Create a comprehensive prompt for code generation
             prompt = self._create_code_generation_prompt(task_description)
 
             # Call OpenAI API
             response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": self._get_system_prompt()},
                     {"role": "user", "content": prompt}
@@ -43,26 +298,225 @@ class CodingAgent:
                 max_tokens=1500
             )
 
-            # Parse the response
+            self._log_prompt_cache_usage(response)
             content = response.choices[0].message.content
-            code, explanation = self._parse_response(content)
+            return self._finish_generation(task_description, cache_key,
+                                           embedding, content)
 
+        except Exception as e:
             return {
+                "success": False,
+                "error": str(e),
+                "code": "",
+                "explanation": f"Failed to generate code: {str(e)}",
+                "task": task_description
+            }
+
+    def _lookup_exact(self, cache_key: str, task_description: str) -> Optional[Dict]:
+        """Return a copy of the exact-cache entry for this key, if present."""
+        with self._cache_lock:
+            if cache_key in self._exact_cache:
+                self._exact_cache.move_to_end(cache_key)
+                cached = copy.deepcopy(self._exact_cache[cache_key])
+                cached["task"] = task_description
+                return cached
+        return None
+
+    def _finish_generation(self, task_description: str, cache_key: str,
+                           embedding: Optional[np.ndarray], content: str) -> Dict:
+        """Parse a completion and record it in both caches."""
+        code, explanation = self._parse_response(content)
+
+        result = {
+            "success": True,
+            "code": code,
+            "explanation": explanation,
+            "task": task_description,
+            "model_used": "gpt-4o-mini"
+        }
+
+        with self._cache_lock:
+            self._exact_cache[cache_key] = {
                 "success": True,
                 "code": code,
                 "explanation": explanation,
-                "task": task_description,
-                "model_used": "gpt-3.5-turbo"
+                "model_used": result["model_used"]
             }
+            self._exact_cache.move_to_end(cache_key)
+            while len(self._exact_cache) > self._exact_cache_size:
+                self._exact_cache.popitem(last=False)
+
+        if self._prompt_cache is not None and embedding is not None:
+            self._prompt_cache.store(task_description, embedding, result)
+
+        return result
+
+    def generate_code_stream(self, task_description: str) -> Iterator[Tuple[str, any]]:
+        """
+        Stream code generation as fragments arrive from the model.
+
+        Yields ("delta", text) for each streamed fragment, ("code", code)
+        once the python code fence closes mid-stream (so callers can act on
+        the code before the explanation finishes), and finally
+        ("result", dict) with the same parsed payload generate_code returns.
+        Cache hits yield only the ("result", dict) event.
+
+        Args:
+            task_description (str): Natural language description of the programming task
+        """
+        try:
+            cache_key = self._exact_cache_key(task_description)
+            cached = self._lookup_exact(cache_key, task_description)
+            if cached is not None:
+                yield ("result", cached)
+                return
+
+            embedding = None
+            if self._prompt_cache is not None:
+                embedding = self._embed_task(task_description)
+                if embedding is not None:
+                    cached = self._prompt_cache.lookup(task_description, embedding)
+                    if cached is not None:
+                        cached["task"] = task_description
+                        yield ("result", cached)
+                        return
+
+            prompt = self._create_code_generation_prompt(task_description)
+
+            stream = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": self._get_system_prompt()},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=1500,
+                stream=True
+            )
+
+            buffer = []
+            code = None
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                buffer.append(delta)
+                yield ("delta", delta)
+
+                # Only scan the rolling buffer when a fence may have closed
+                if code is None and '```' in delta:
+                    match = _CODE_PY_RE.search(''.join(buffer))
+                    if match:
+                        code = match.group(1).strip()
+                        yield ("code", code)
+
+            content = ''.join(buffer)
+            yield ("result", self._finish_generation(task_description, cache_key,
+                                                     embedding, content))
 
         except Exception as e:
-            return {
+            yield ("result", {
                 "success": False,
                 "error": str(e),
                 "code": "",
                 "explanation": f"Failed to generate code: {str(e)}",
                 "task": task_description
-            }
+            })
+
+    def generate_code_batch(self, tasks: List[str]) -> List[Dict[str, any]]:
+        """
+        Generate code for several tasks with a single OpenAI call.
+
+        Packs all task descriptions into one prompt and asks the model for
+        delimited per-task blocks, saving the per-call network and prefill
+        overhead of N separate requests.
+
+        Args:
+            tasks (List[str]): Natural language task descriptions
+
+        Returns:
+            List of result dicts, one per task, in input order
+        """
+        if not tasks:
+            return []
+
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": self._get_batch_system_prompt()},
+                    {"role": "user", "content": self._create_batch_prompt(tasks)}
+                ],
+                temperature=0.3,
+                max_tokens=min(4000, 1500 * len(tasks))
+            )
+
+            self._log_prompt_cache_usage(response)
+            content = response.choices[0].message.content
+
+            # One regex pass extracts every (index, code, explanation) block
+            parsed = {}
+            for index, code, explanation in _BATCH_ITEM_RE.findall(content):
+                parsed[int(index)] = (code.strip(), explanation.strip())
+
+            results = []
+            for i, task in enumerate(tasks, start=1):
+                if i in parsed:
+                    code, explanation = parsed[i]
+                    results.append({
+                        "success": True,
+                        "code": code,
+                        "explanation": explanation,
+                        "task": task,
+                        "model_used": "gpt-4o-mini"
+                    })
+                else:
+                    results.append({
+                        "success": False,
+                        "error": f"No response block for task {i}",
+                        "code": "",
+                        "explanation": "The model did not return code for this task.",
+                        "task": task
+                    })
+            return results
+
+        except Exception as e:
+            return [{
+                "success": False,
+                "error": str(e),
+                "code": "",
+                "explanation": f"Failed to generate code: {str(e)}",
+                "task": task
+            } for task in tasks]
+
+    def _get_batch_system_prompt(self) -> str:
+        """Get the system prompt for batched code generation."""
+        return """You are an expert Python programmer. You will receive several numbered programming tasks in one message. For each task, generate clean, efficient, and well-commented Python code.
+
+Respond with one block per task, in order, using exactly this format and no other text:
+
+<<<ITEM 1>>>
+```python
+# Your generated Python code for task 1
+```
+Explanation: Brief explanation of what the code does and how it works.
+
+<<<ITEM 2>>>
+```python
+# Your generated Python code for task 2
+```
+Explanation: Brief explanation of what the code does and how it works."""
+
+    def _create_batch_prompt(self, tasks: List[str]) -> str:
+        """Create a single prompt packing all task descriptions."""
+        numbered = "\n".join(f"{i}. {task}" for i, task in enumerate(tasks, start=1))
+        return f"""Generate Python code for each of the following tasks:
+
+{numbered}
+
+Provide one <<<ITEM i>>> block per task, in order. Make sure each code block is ready to run and includes any necessary imports."""
 
     def _get_system_prompt(self) -> str:
         """Get the system prompt for the AI model."""
@@ -82,7 +536,18 @@ Response format:
 # Your generated Python code here
 ```
 
-Explanation: Brief explanation of what the code does and how it works."""
+Explanation: Brief explanation of what the code does and how it works.
+""" + _SYSTEM_PROMPT_EXTENSION
+
+    def _log_prompt_cache_usage(self, response):
+        """Log server-side prompt-cache hits so caching can be verified."""
+        if not Config.DEBUG:
+            return
+        usage = getattr(response, 'usage', None)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = getattr(details, 'cached_tokens', None)
+        if cached:
+            print(f"OpenAI prompt cache hit: {cached} cached prompt tokens")
 
     def _create_code_generation_prompt(self, task_description: str) -> str:
         """Create a detailed prompt for code generation."""
@@ -108,15 +573,13 @@ Make sure the code is ready to run and includes any necessary imports."""
             Tuple of (code, explanation)
         """
         # Extract code block
-        code_pattern = r'```python\n(.*?)```'
-        code_match = re.search(code_pattern, content, re.DOTALL)
+        code_match = _CODE_PY_RE.search(content)
 
         if code_match:
             code = code_match.group(1).strip()
         else:
             # Fallback: look for any code block
-            code_pattern_generic = r'```\n(.*?)```'
-            code_match_generic = re.search(code_pattern_generic, content, re.DOTALL)
+            code_match_generic = _CODE_ANY_RE.search(content)
             if code_match_generic:
                 code = code_match_generic.group(1).strip()
             else:
@@ -127,7 +590,7 @@ Make sure the code is ready to run and includes any necessary imports."""
             explanation_start = code_match.end()
             explanation = content[explanation_start:].strip()
             # Remove "Explanation:" prefix if present
-            explanation = re.sub(r'^Explanation:\s*', '', explanation, flags=re.IGNORECASE)
+            explanation = _EXPL_PREFIX_RE.sub('', explanation)
         else:
             explanation = "Generated code based on the given task description."
 
@@ -154,9 +617,9 @@ Make sure the code is ready to run and includes any necessary imports."""
                 ]
             }
 
-        # Check for vague descriptions
-        vague_keywords = ['something', 'anything', 'stuff', 'thing']
-        if any(keyword in task_description.lower() for keyword in vague_keywords):
+        # Check for vague descriptions via set intersection on word tokens
+        tokens = set(_WORD_RE.findall(task_description.lower()))
+        if tokens & _VAGUE_KEYWORDS:
             return {
                 "valid": True,
                 "message": "Your description seems vague. Consider being more specific.",
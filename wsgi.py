@@ -0,0 +1,17 @@
+"""
+WSGI entrypoint for running the app under a production server.
+
+The dev server (`python app.py`) is single-threaded, so every request that
+blocks on OpenAI serializes the whole app. Run with multiple workers and
+threads instead:
+
+    gunicorn -k gthread -w $(nproc) --threads 8 --timeout 60 wsgi:application
+
+Components (coding agent, executor) are created lazily on first request,
+so each worker pays initialization once after fork.
+"""
+
+from app import app as application
+
+if __name__ == "__main__":
+    application.run()